@@ -107,6 +107,14 @@ def device_count(*args, **kwargs):
   return backend()['device_count'](*args, **kwargs)
 
 
+def device_put(*args, **kwargs):
+  return backend()['device_put'](*args, **kwargs)
+
+
+def device_platform(*args, **kwargs):
+  return backend()['device_platform'](*args, **kwargs)
+
+
 # For numpy and random modules, we need to call "backend()" lazily, only when
 # the function is called -- so that it can be set by gin configs.
 # (Otherwise, backend() is called on import before gin-config is parsed.)
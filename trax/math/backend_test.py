@@ -72,5 +72,16 @@ class BackendTest(test.TestCase):
     self.assertEqual(onp.isinf, numpy.isinf)
     self.assertEqual(onp.inf, numpy.inf)
 
+  def test_device_functions_in_all_backends(self):
+    for name in ('jax', 'numpy', 'tf'):
+      with math.use_backend(name):
+        self.assertIn(math.device_platform(), ('cpu', 'gpu', 'tpu'))
+        self.assertIsNotNone(math.device_put(onp.zeros(2)))
+
+    with math.use_backend('numpy'):
+      x = onp.zeros(2)
+      self.assertIs(x, math.device_put(x))
+      self.assertEqual('cpu', math.device_platform())
+
 if __name__ == '__main__':
   test.main()
@@ -224,4 +224,6 @@ JAX_BACKEND = {
     'random_split': jax_random.split,
     'dataset_as_numpy': tfds.as_numpy,
     'device_count': jax.local_device_count,
+    'device_put': jax.device_put,
+    'device_platform': lambda: jax.local_devices()[0].platform,
 }
@@ -26,6 +26,8 @@ NUMPY_BACKEND = {
     'name': 'numpy',
     'np': onp,
     'jit': lambda f: f,
+    'device_put': lambda x: x,
+    'device_platform': lambda: 'cpu',
     'random_get_prng': lambda seed: None,
     'random_split': lambda prng, num=2: (None,) * num,
     'expit': lambda x: 1. / (1. + onp.exp(-x)),
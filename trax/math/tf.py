@@ -105,6 +105,14 @@ def _tf_jit(*args, **kwargs):
   return tf_np_extensions.jit(*args, **kwargs)
 
 
+def _tf_device_platform():
+  if tf_np_extensions.tpu_devices():
+    return 'tpu'
+  if tf_np_extensions.gpu_devices():
+    return 'gpu'
+  return 'cpu'
+
+
 TF_BACKEND = {
     'name': 'tf',
     'np': tf_np,
@@ -125,6 +133,8 @@ TF_BACKEND = {
     'random_split': tf_np_extensions.split,
     'dataset_as_numpy': tf_np_extensions.dataset_as_numpy,
     'device_count': lambda: max(len(tf_np_extensions.accelerators()), 1),
+    'device_put': lambda x: x,
+    'device_platform': _tf_device_platform,
     'pmap': tf_np_extensions.pmap,
     'psum': tf_np_extensions.psum,
 }
@@ -26,6 +26,7 @@ from trax import lr_schedules as lr
 from trax import supervised
 from trax.math import numpy as jnp
 from trax.rl import advantages as rl_advantages
+from trax.rl import rl_layers
 from trax.rl import training as rl_training
 
 
@@ -353,8 +354,7 @@ def AWRLoss(x, beta, w_max, **unused_kwargs):
   """Definition of the Advantage Weighted Regression (AWR) loss."""
   (log_probs, advantages, old_log_probs, mask) = x
   del old_log_probs  # Not used in AWR.
-  weights = jnp.minimum(jnp.exp(advantages / beta), w_max)
-  return -np.sum(log_probs * weights * mask) / np.sum(mask)
+  return rl_layers.AWRLoss(log_probs, advantages, mask, beta=beta, w_max=w_max)
 
 
 class AWRTrainer(AdvantageBasedActorCriticTrainer):
@@ -16,18 +16,67 @@
 # Lint as: python3
 """Classes for RL training in Trax."""
 
+import collections
 import functools
+import itertools
+
+import numpy as np
 
 from trax import layers as tl
 from trax import lr_schedules as lr
+from trax import math
+from trax import shapes
 from trax import supervised
 from trax.math import numpy as jnp
-from trax.rl import actor_critic
 from trax.rl import distributions
 from trax.rl import rl_layers
 from trax.rl import training as rl_training
 
 
+def _prefetch_to_device(stream, queue, size=2):
+  """Yields batches from stream after starting their transfer to the device.
+
+  Transfers are dispatched asynchronously, so keeping `size` batches in flight
+  overlaps copying the next batches with the training step on the current one.
+  Batches in flight are kept in `queue`; clearing it drops them, and the next
+  batches are then sampled from the stream anew.
+
+  Args:
+    stream: an iterator of tuples of numpy arrays.
+    queue: an empty collections.deque holding the batches in flight.
+    size: how many batches to transfer ahead of the one being used.
+
+  Yields:
+    the batches from stream, as device arrays.
+  """
+  while True:
+    for batch in itertools.islice(stream, size + 1 - len(queue)):
+      queue.append(math.device_put(batch))
+    if not queue:
+      return
+    yield queue.popleft()
+
+
+class _PrefetchingInputs(supervised.Inputs):
+  """Inputs that prefetch only the training stream to the device."""
+
+  def __init__(self, stream, prefetching_stream):
+    """Initializes the inputs.
+
+    Args:
+      stream: a function taking n_devices (an int) and returning a python
+        generator of batches; used for evaluation and to peek at the shapes.
+      prefetching_stream: like stream, but prefetching its batches; used for
+        training, which is the only stream read every step.
+    """
+    super(_PrefetchingInputs, self).__init__(
+        train_stream=stream, eval_stream=stream, train_eval_stream=stream)
+    self._prefetching_stream = prefetching_stream
+
+  def train_stream(self, n_devices):
+    return self._prefetching_stream(n_devices)
+
+
 # pylint: disable=g-long-lambda
 class ActorCriticJointTrainer(rl_training.RLTrainer):
   """Trains a joint policy-and-value model using actor-critic methods."""
@@ -37,7 +86,8 @@ class ActorCriticJointTrainer(rl_training.RLTrainer):
                batch_size=64, train_steps_per_epoch=500,
                supervised_evals_per_epoch=1, supervised_eval_steps=1,
                collect_per_epoch=50, max_slice_length=1,
-               normalize_advantages=True, output_dir=None):
+               normalize_advantages=True, output_dir=None,
+               use_real_example=False, low_precision_batches=False):
     """Configures the joint trainer.
 
     Args:
@@ -56,6 +106,12 @@ class ActorCriticJointTrainer(rl_training.RLTrainer):
       normalize_advantages: if True, then normalize advantages - currently
           implemented only in PPO.
       output_dir: Path telling where to save outputs (evals and checkpoints).
+      use_real_example: if True, initialize the eval model on a batch drawn
+          from self.batches_stream; otherwise use the shape and dtype of a
+          single stored observation.
+      low_precision_batches: if True, returns and old log-probabilities are
+          sent to the device as bfloat16, halving their transfer size; losses
+          compute in float32 regardless.
     """
     super(ActorCriticJointTrainer, self).__init__(
         task, collect_per_epoch=collect_per_epoch, output_dir=output_dir)
@@ -66,19 +122,35 @@ class ActorCriticJointTrainer(rl_training.RLTrainer):
     self._collect_per_epoch = collect_per_epoch
     self._max_slice_length = max_slice_length
     self._policy_dist = distributions.create_distribution(task.action_space)
+    # Jitted once, so the losses and all metrics share the same functions.
+    # Sampling is not jitted: it draws its noise with numpy on the host.
+    self._log_prob = math.jit(self._policy_dist.log_prob)
+    self._entropy = math.jit(self._policy_dist.entropy)
     self._lr_schedule = lr_schedule
     self._optimizer = optimizer
     self._normalize_advantages = normalize_advantages
+    self._batch_dtype = jnp.bfloat16 if low_precision_batches else jnp.float32
 
     # Inputs to the joint model are produced by self.batches_stream.
-    self._inputs = supervised.Inputs(
-        train_stream=lambda _: self.batches_stream())
+    self._prefetch_queues = []
+    self._inputs = _PrefetchingInputs(
+        stream=lambda _: self.batches_stream(),
+        prefetching_stream=self._train_stream)
 
     self._joint_model = functools.partial(
         joint_model,
         policy_distribution=self._policy_dist,
     )
 
+    metrics = {'joint_loss': self.joint_loss,
+               'advantage_mean': self.advantage_mean,
+               'advantage_norm': self.advantage_norm,
+               'value_loss': self.value_loss,
+               'explained_variance': self.explained_variance,
+               'log_probs_mean': self.log_probs_mean,
+               'preferred_move': self.preferred_move}
+    metrics.update(self.extra_metrics)
+
     # This is the joint Trainer that will be used to train the policy model.
     # * inputs to the trainer come from self.batches_stream
     # * outputs are passed to self._joint_loss
@@ -89,108 +161,139 @@ class ActorCriticJointTrainer(rl_training.RLTrainer):
         loss_fn=self.joint_loss,
         inputs=self._inputs,
         output_dir=output_dir,
-        metrics={'joint_loss': self.joint_loss,
-                 'advantage_mean': self.advantage_mean,
-                 'advantage_norm': self.advantage_norm,
-                 'value_loss': self.value_loss,
-                 'explained_variance': self.explained_variance,
-                 'log_probs_mean': self.log_probs_mean,
-                 'preferred_move': self.preferred_move})
+        metrics=metrics)
     self._eval_model = self._joint_model(mode='eval')
-    example_batch = next(self.batches_stream())
-    self._eval_model.init(example_batch)
+    # Trainer step at which the eval model weights were last updated.
+    self._weights_version = -1
+    self._on_tpu = math.device_platform() == 'tpu'
+    if use_real_example:
+      example_batch = next(self.batches_stream())
+      self._eval_model.init(example_batch)
+    else:
+      self._eval_model.init(self._observations_signature())
+
+  def _observations_signature(self):
+    """Signature of a batch of observations of size 1 and maximum length."""
+    trajectory = next(tr for trajectories in self._task.trajectories.values()
+                      for tr in trajectories)
+    observation = trajectory[:1].observations_np(
+        timestep_to_np=self._task.timestep_to_np)[0]
+    return shapes.ShapeDtype(
+        (1, self._max_slice_length) + observation.shape, observation.dtype)
 
   def batches_stream(self):
     """Use self.task to create inputs to the policy model."""
     return NotImplementedError
 
+  def _train_stream(self, n_devices):
+    """Stream of training batches, prefetched to the device if there is one."""
+    stream = self.batches_stream()
+    if n_devices > 1:
+      # The Trainer splits batches between devices itself.
+      return stream
+    queue = collections.deque()
+    self._prefetch_queues.append(queue)
+    return _prefetch_to_device(stream, queue)
+
   @property
   def joint_loss(self):
     """Joint policy and value loss layer."""
     return NotImplementedError
 
+  @property
+  def extra_metrics(self):
+    """Algorithm-specific metrics added to the ones reported by all trainers."""
+    return {}
+
+  @property
+  def _advantages(self):
+    """Layer computing advantages from (dist_inputs, values, returns)."""
+    return tl.Serial(tl.Select([1, 2], n_in=3),
+                     tl.Fn(rl_layers.Advantages, n_in=2, n_out=1))
+
   @property
   def advantage_mean(self):
     """Mean of advantages."""
-    def AdvantageMean(values, returns):
-      """Definition of the mean of advantages."""
-      advantages = returns - values
-      return jnp.mean(advantages)
-    layer = tl.Fn(
-        lambda dist_inputs, values, returns: AdvantageMean(values, returns),
-        n_in=3,
-        n_out=1)
+    layer = tl.Serial(self._advantages,
+                      tl.Fn(rl_layers.AdvantageMean, n_in=1, n_out=1))
     return lambda **unused_kwargs: layer
 
   @property
   def advantage_norm(self):
-    """Mean of advantages."""
-    def AdvantageNorm(values, returns):
-      """Definition of the mean of advantages."""
-      advantages = returns - values
-      return jnp.linalg.norm(advantages)
-    layer = tl.Fn(
-        lambda dist_inputs, values, returns: AdvantageNorm(values, returns),
-        n_in=3,
-        n_out=1)
+    """Norm of advantages."""
+    layer = tl.Serial(self._advantages,
+                      tl.Fn(rl_layers.AdvantageNorm, n_in=1, n_out=1))
     return lambda **unused_kwargs: layer
 
   @property
   def value_loss(self):
     """Value loss - so far generic for all A2C."""
-    layer = tl.Fn(lambda dist_inputs, values, returns: rl_layers.ValueLoss(
-        values, returns, self._value_loss_coeff),
-                  n_in=3, n_out=1)
+    layer = tl.Serial(
+        self._advantages,
+        tl.Fn(functools.partial(rl_layers.ValueLoss,
+                                value_loss_coeff=self._value_loss_coeff),
+              n_in=1, n_out=1))
     return lambda **unused_kwargs: layer
 
   @property
   def explained_variance(self):
     """Explained variance metric."""
-    layer = tl.Fn(rl_layers.ExplainedVariance,
-                  n_in=2, n_out=1)
+    layer = tl.Serial(tl.Select([0, 1, 2, 2], n_in=3),  # Keep the returns.
+                      self._advantages,
+                      tl.Fn(rl_layers.ExplainedVariance, n_in=2, n_out=1))
     return lambda **unused_kwargs: layer
 
   @property
   def log_probs_mean(self):
     """Mean of log_probs aka dist_inputs."""
-    layer = tl.Fn(lambda dist_inputs, values: jnp.mean(dist_inputs),
-                  n_in=2, n_out=1)
+    layer = tl.Fn(lambda dist_inputs: jnp.mean(dist_inputs), n_in=1, n_out=1)
     return lambda **unused_kwargs: layer
 
   @property
   def preferred_move(self):
     """Preferred move - the mean of selected moves."""
-    layer = tl.Fn(lambda dist_inputs, values: rl_layers.PreferredMove(
-        dist_inputs, self._policy_dist.sample), n_in=2, n_out=1)
+    layer = tl.Fn(functools.partial(rl_layers.PreferredMove,
+                                    sample=self._policy_dist.sample),
+                  n_in=1, n_out=1)
     return lambda **unused_kwargs: layer
 
   def policy(self, trajectory):
     """Chooses an action to play after a trajectory."""
     model = self._eval_model
-    model.weights = self._trainer.model_weights
-    # The two lines below along with the copying
-    # before return make the TPU happy
+    # Weights only change when the trainer steps, so copy them once per epoch.
+    if self._trainer.step != self._weights_version:
+      model.weights = self._trainer.model_weights
+      self._weights_version = self._trainer.step
     tr_slice = trajectory[-self._max_slice_length:]
-    trajectory_np = tr_slice.to_np(timestep_to_np=self.task.timestep_to_np)
-    # Add batch dimension to trajectory_np and run the model.
-    pred = model(trajectory_np.observations[None, ...], n_accelerators=1)[0]
+    observations = tr_slice.observations_np(
+        timestep_to_np=self.task.timestep_to_np)
+    # Add batch dimension to observations and run the model.
+    pred = model(observations[None, ...], n_accelerators=1)[0]
     # Pick element 0 from the batch (the only one), last (current) timestep.
     pred = pred[0, -1, :]
     sample = self._policy_dist.sample(pred)
-    log_prob = self._policy_dist.log_prob(pred, sample)
-    return (sample.copy(), log_prob.copy())
+    log_prob = self._log_prob(pred, sample)
+    if self._on_tpu:
+      # Copying before return makes the TPU happy.
+      return (sample.copy(), log_prob.copy())
+    # Elsewhere converting to host numpy arrays is enough.
+    return (np.asarray(sample), np.asarray(log_prob))
 
   def train_epoch(self):
     """Trains RL for one epoch."""
+    # Batches prefetched before the last collection miss its trajectories.
+    for queue in self._prefetch_queues:
+      queue.clear()
     n_evals = rl_training.remaining_evals(
         self._trainer.step,
         self._epoch,
         self._train_steps_per_epoch,
         self._supervised_evals_per_epoch)
+    n_steps = self._train_steps_per_epoch // self._supervised_evals_per_epoch
+    # This loop runs once per evaluation round, not once per step: each
+    # Trainer.train_epoch runs n_steps jitted updates and then evaluates.
     for _ in range(n_evals):
-      self._trainer.train_epoch(
-          self._train_steps_per_epoch // self._supervised_evals_per_epoch,
-          self._supervised_eval_steps)
+      self._trainer.train_epoch(n_steps, self._supervised_eval_steps)
 
 
 class PPOJointTrainer(ActorCriticJointTrainer):
@@ -206,31 +309,26 @@ class PPOJointTrainer(ActorCriticJointTrainer):
   def __init__(self, task, epsilon=0.2, value_loss_coeff=0.1,
                entropy_coeff=0.01, **kwargs):
     """Configures the PPO Trainer."""
-    self._epsilon = epsilon
-    self._value_loss_coeff = value_loss_coeff
-    self._entropy_coeff = entropy_coeff
+    # Stored as Python floats, whatever type they are configured with, so they
+    # are always weakly-typed compile-time constants and never device arrays.
+    self._epsilon = float(epsilon)
+    self._value_loss_coeff = float(value_loss_coeff)
+    self._entropy_coeff = float(entropy_coeff)
+    # The hyperparameters above are read at trace time, so XLA sees them as
+    # constants and fuses the three sub-losses into a single computation.
+    self._jit_joint_loss = math.jit(self._ppo_joint_loss)
     super(PPOJointTrainer, self).__init__(task, **kwargs)
-    self._trainer = supervised.Trainer(
-        model=self._joint_model,
-        optimizer=self._optimizer,
-        lr_schedule=self._lr_schedule,
-        loss_fn=self.joint_loss,
-        inputs=self._inputs,
-        output_dir=self._output_dir,
-        metrics={'joint_loss': self.joint_loss,
-                 'advantage_mean': self.advantage_mean,
-                 'advantage_norm': self.advantage_norm,
-                 'value_loss': self.value_loss,
-                 'explained_variance': self.explained_variance,
-                 'log_probs_mean': self.log_probs_mean,
-                 'entropy_loss': self.entropy_loss,
-                 'probs_ratio_mean': self.probs_ratio_mean,
-                 'unclipped_objective_mean': self.unclipped_objective_mean,
-                 'clipped_objective_mean': self.clipped_objective_mean,
-                 'ppo_objective_mean': self.ppo_objective_mean,
-                 'clip_fraction': self.clip_fraction,
-                 'approximate_kl_divergence': self.approximate_kl_divergence,
-                 'preferred_move': self.preferred_move})
+
+  @property
+  def extra_metrics(self):
+    """PPO-specific metrics."""
+    return {'entropy_loss': self.entropy_loss,
+            'probs_ratio_mean': self.probs_ratio_mean,
+            'unclipped_objective_mean': self.unclipped_objective_mean,
+            'clipped_objective_mean': self.clipped_objective_mean,
+            'ppo_objective_mean': self.ppo_objective_mean,
+            'clip_fraction': self.clip_fraction,
+            'approximate_kl_divergence': self.approximate_kl_divergence}
 
   def batches_stream(self):
     """Use the RLTask self._task to create inputs to the value model."""
@@ -238,155 +336,154 @@ class PPOJointTrainer(ActorCriticJointTrainer):
         self._batch_size, max_slice_length=self._max_slice_length, epochs=[-1]):
       # Insert an extra depth dimension, so the target shape is consistent with
       # the network output shape.
+      returns = np_trajectory.returns[:, :, None].astype(
+          self._batch_dtype, copy=False)
+      log_probs = np_trajectory.log_probs.astype(self._batch_dtype, copy=False)
       yield (np_trajectory.observations,         # Inputs to the value model.
-             np_trajectory.returns[:, :, None],
+             returns,
              np_trajectory.actions,
-             np_trajectory.log_probs,
+             log_probs,
              np_trajectory.mask)
 
+  def _ppo_joint_loss(self, dist_inputs, values, returns, actions,
+                      old_log_probs, mask):
+    """Definition of the Proximal Policy Optimization loss."""
+    del mask  # TODO(lukaszkaiser): make PPO work with Transformer
+
+    # Both the objective and the entropy need the same new log probs, and
+    # both the objective and the value loss need the same advantages.
+    new_log_probs = rl_layers.NewLogProbs(
+        dist_inputs, actions, log_prob_fun=self._log_prob)
+    advantages = rl_layers.Advantages(values, returns)
+
+    probs_ratio = rl_layers.ProbsRatio(
+        dist_inputs, actions, old_log_probs,
+        log_prob_fun=self._log_prob,
+        new_log_probs=new_log_probs)
+    ppo_objective_mean = rl_layers.PPOObjectiveMean(
+        probs_ratio, advantages,
+        epsilon=self._epsilon,
+        normalize_advantages=self._normalize_advantages)
+
+    entropy_loss = rl_layers.EntropyLoss(
+        dist_inputs, actions,
+        log_prob_fun=self._log_prob,
+        entropy_coeff=self._entropy_coeff,
+        entropy_fun=self._entropy,
+        new_log_probs=new_log_probs)
+
+    l2_value_loss = rl_layers.ValueLoss(
+        advantages, value_loss_coeff=self._value_loss_coeff)
+
+    return -ppo_objective_mean + l2_value_loss - entropy_loss
+
   @property
   def joint_loss(self):
     """Joint policy and value loss."""
     def PPOJointLoss(dist_inputs, values, returns, actions, old_log_probs,
                      mask):
-      """Definition of the Proximal Policy Optimization loss."""
-      del mask  # TODO(lukaszkaiser): make PPO work with Transformer
+      """Calls the jitted loss; tl.Fn can't inspect the jit wrapper's args."""
+      return self._jit_joint_loss(
+          dist_inputs, values, returns, actions, old_log_probs, mask)
 
-      ppo_objective = rl_layers.PPOObjective(
-          dist_inputs, values, returns, actions, old_log_probs,
-          log_prob_fun=self._policy_dist.log_prob,
-          epsilon=self._epsilon,
-          normalize_advantages=self._normalize_advantages)
-
-      entropy_loss = rl_layers.EntropyLoss(
-          dist_inputs, actions,
-          log_prob_fun=self._policy_dist.log_prob,
-          entropy_coeff=self._entropy_coeff,
-          entropy_fun=self._policy_dist.entropy)
-
-      l2_value_loss = rl_layers.ValueLoss(
-          values, returns, value_loss_coeff=self._value_loss_coeff)
+    return lambda **unused_kwargs: tl.Fn(PPOJointLoss, n_in=6, n_out=1)
 
-      return -ppo_objective.mean() + l2_value_loss - entropy_loss
+  @property
+  def _probs_ratio_and_advantages(self):
+    """Layer computing the probability ratio and advantages for one metric."""
+    return tl.Fn(
+        functools.partial(rl_layers.ProbsRatioAndAdvantages,
+                          log_prob_fun=self._log_prob),
+        n_in=5,
+        n_out=2)
 
-    return lambda **unused_kwargs: tl.Fn(PPOJointLoss, n_in=6, n_out=1)
+  @property
+  def _probs_ratio(self):
+    """Layer computing only the probability ratio, without advantages."""
+    return tl.Serial(
+        tl.Select([0, 3, 4], n_in=5),  # dist_inputs, actions, old_log_probs
+        tl.Fn(functools.partial(rl_layers.ProbsRatio,
+                                log_prob_fun=self._log_prob),
+              n_in=3, n_out=1))
 
   @property
   def probs_ratio_mean(self):
-    """Joint policy and value loss layer."""
-    def ProbsRatioMean(dist_inputs, actions, old_log_probs):
-      """Probability Ratio Mean from the PPO algorithm."""
-      probs_ratio = rl_layers.ProbsRatio(
-          dist_inputs, actions, old_log_probs,
-          log_prob_fun=self._policy_dist.log_prob)
-      return jnp.mean(probs_ratio)
-
-    layer = tl.Fn(
-        lambda dist_inputs, values, returns, actions, old_log_probs:
-        ProbsRatioMean(dist_inputs, actions, old_log_probs),
-        n_in=5,
-        n_out=1)
+    """Probability ratio mean layer."""
+    layer = tl.Serial(self._probs_ratio,
+                      tl.Fn(rl_layers.ProbsRatioMean, n_in=1, n_out=1))
     return lambda **unused_kwargs: layer
 
   @property
   def clip_fraction(self):
-    """Joint policy and value loss layer."""
-    def ClipFraction(dist_inputs, actions, old_log_probs):
-      """Probability Ratio Mean from the PPO algorithm."""
-      probs_ratio = rl_layers.ProbsRatio(
-          dist_inputs, actions, old_log_probs,
-          log_prob_fun=self._policy_dist.log_prob)
-      return jnp.mean(jnp.abs(probs_ratio - 1) > self._epsilon)
-
-    layer = tl.Fn(
-        lambda dist_inputs, values, returns, actions, old_log_probs:
-        ClipFraction(dist_inputs, actions, old_log_probs),
-        n_in=5,
-        n_out=1)
-    return lambda **unusd_kwargs: layer
+    """Clip fraction layer."""
+    layer = tl.Serial(
+        self._probs_ratio,
+        tl.Fn(functools.partial(rl_layers.ClipFraction, epsilon=self._epsilon),
+              n_in=1, n_out=1))
+    return lambda **unused_kwargs: layer
 
   @property
   def entropy_loss(self):
     """Entropy layer."""
-    layer = tl.Fn(
-        lambda dist_inputs, values, returns, actions:
-        rl_layers.EntropyLoss(
-            dist_inputs, actions, log_prob_fun=self._policy_dist.log_prob,
-            entropy_coeff=self._entropy_coeff,
-            entropy_fun=self._policy_dist.entropy),
-        n_in=4, n_out=1)
-    return lambda **unusd_kwargs: layer
+    layer = tl.Serial(
+        tl.Select([0, 3], n_in=4),
+        tl.Fn(functools.partial(rl_layers.EntropyLoss,
+                                log_prob_fun=self._log_prob,
+                                entropy_coeff=self._entropy_coeff,
+                                entropy_fun=self._entropy),
+              n_in=2, n_out=1))
+    return lambda **unused_kwargs: layer
 
   @property
   def approximate_kl_divergence(self):
-    """Entropy layer."""
-    layer = tl.Fn(
-        lambda dist_inputs, actions, old_log_probs:
-        rl_layers.ApproximateKLDivergence(
-            dist_inputs,
-            actions,
-            old_log_probs,
-            log_prob_fun=self._policy_dist.log_prob),
-        n_in=3,
-        n_out=1)
+    """Approximate KL divergence layer."""
+    layer = tl.Serial(
+        tl.Select([0, 3, 4], n_in=5),  # dist_inputs, actions, old_log_probs
+        tl.Fn(functools.partial(rl_layers.ApproximateKLDivergence,
+                                log_prob_fun=self._log_prob),
+              n_in=3, n_out=1))
     return lambda **unused_kwargs: layer
 
   @property
   def unclipped_objective_mean(self):
-    def UnclippedObjectiveMean(dist_inputs, values,
-                               returns, actions, old_log_probs):
-      """Unclipped objective Mean from the PPO algorithm."""
-      advantages = returns - values
-      probs_ratio = rl_layers.ProbsRatio(
-          dist_inputs, actions, old_log_probs,
-          log_prob_fun=self._policy_dist.log_prob)
-      unclipped_objective = rl_layers.UnclippedObjective(
-          probs_ratio, advantages)
-      return jnp.mean(unclipped_objective)
-
-    return lambda **unused_kwargs: tl.Fn(
-        UnclippedObjectiveMean, n_in=5, n_out=1)
+    """Unclipped objective mean layer."""
+    layer = tl.Serial(
+        self._probs_ratio_and_advantages,
+        tl.Fn(rl_layers.UnclippedObjectiveMean, n_in=2, n_out=1))
+    return lambda **unused_kwargs: layer
 
   @property
   def clipped_objective_mean(self):
-    def ClippedObjectiveMean(
-        dist_inputs, values, returns, actions, old_log_probs):
-      """Clipped objective from the PPO algorithm."""
-      advantages = returns - values
-      probs_ratio = rl_layers.ProbsRatio(
-          dist_inputs, actions, old_log_probs,
-          log_prob_fun=self._policy_dist.log_prob)
-      clipped_objective = rl_layers.ClippedObjective(
-          probs_ratio, advantages, epsilon=self._epsilon)
-      return jnp.mean(clipped_objective)
-
-    return lambda **unused_kwargs: tl.Fn(ClippedObjectiveMean, n_in=5, n_out=1)
+    """Clipped objective mean layer."""
+    layer = tl.Serial(
+        self._probs_ratio_and_advantages,
+        tl.Fn(functools.partial(rl_layers.ClippedObjectiveMean,
+                                epsilon=self._epsilon),
+              n_in=2, n_out=1))
+    return lambda **unused_kwargs: layer
 
   @property
   def ppo_objective(self):
     """PPO objective with local parameters."""
     layer = tl.Fn(
-        lambda dist_inputs, values, returns, actions, old_log_probs:
-        rl_layers.PPOObjective(
-            dist_inputs, values, returns, actions, old_log_probs,
-            log_prob_fun=self._policy_dist.log_prob,
-            epsilon=self._epsilon,
-            normalize_advantages=self._normalize_advantages),
+        functools.partial(rl_layers.PPOObjective,
+                          log_prob_fun=self._log_prob,
+                          epsilon=self._epsilon,
+                          normalize_advantages=self._normalize_advantages),
         n_in=5, n_out=1)
     return lambda **unused_kwargs: layer
 
   @property
   def ppo_objective_mean(self):
     """PPO objective mean."""
-    def PPOObjectiveMean(dist_inputs, values, returns, actions, old_log_probs):
-      """Clipped objective from the PPO algorithm."""
-      ppo_objective = rl_layers.PPOObjective(
-          dist_inputs, values, returns, actions, old_log_probs,
-          log_prob_fun=self._policy_dist.log_prob,
-          epsilon=self._epsilon,
-          normalize_advantages=self._normalize_advantages)
-      return jnp.mean(ppo_objective)
-    return lambda **unused_kwargs: tl.Fn(PPOObjectiveMean, n_in=5, n_out=1)
+    normalize_advantages = self._normalize_advantages
+    layer = tl.Serial(
+        self._probs_ratio_and_advantages,
+        tl.Fn(functools.partial(rl_layers.PPOObjectiveMean,
+                                epsilon=self._epsilon,
+                                normalize_advantages=normalize_advantages),
+              n_in=2, n_out=1))
+    return lambda **unused_kwargs: layer
 
 
 class AWRJointTrainer(ActorCriticJointTrainer):
@@ -399,6 +496,7 @@ class AWRJointTrainer(ActorCriticJointTrainer):
     self._beta = beta
     self._w_max = w_max
     self._value_loss_coeff = value_loss_coeff
+    self._jit_joint_loss = math.jit(self._awr_joint_loss)
     super(AWRJointTrainer, self).__init__(task, **kwargs)
 
   def batches_stream(self):
@@ -407,21 +505,29 @@ class AWRJointTrainer(ActorCriticJointTrainer):
         self._batch_size, max_slice_length=self._max_slice_length):
       # Insert an extra depth dimension, so the target shape is consistent with
       # the network output shape.
+      returns = np_trajectory.returns[:, :, None].astype(
+          self._batch_dtype, copy=False)
       yield (np_trajectory.observations,         # Inputs to the value model.
-             np_trajectory.returns[:, :, None],  # Targets: regress to returns.
+             returns,                            # Targets: regress to returns.
              np_trajectory.actions,              # Policy targets: actions.
              np_trajectory.mask)                 # Padding mask.
 
+  def _awr_joint_loss(self, preds, values, returns, actions, mask):
+    """Definition of the joint AWR loss."""
+    advantages = rl_layers.Advantages(values, returns)
+    logps = self._log_prob(preds, actions)
+    # AWR does not use old log probs, so they are not passed at all.
+    awr_loss = rl_layers.AWRLoss(logps, jnp.squeeze(advantages, axis=-1), mask,
+                                 beta=self._beta, w_max=self._w_max)
+    l2_value_loss = rl_layers.ValueLoss(
+        advantages, value_loss_coeff=self._value_loss_coeff)
+    return awr_loss + l2_value_loss
+
   @property
   def joint_loss(self):
     """Joint policy and value loss."""
     @tl.layer(n_in=5, n_out=1)
     def AWRJointLoss(x, **unused_kwargs):  # pylint: disable=invalid-name
       preds, values, returns, actions, mask = x
-      advantages = jnp.squeeze(returns - values, axis=-1)
-      logps = self._policy_dist.log_prob(preds, actions)
-      awr_loss = actor_critic.AWRLoss(beta=self._beta, w_max=self._w_max)(
-          (logps, advantages, jnp.zeros_like(logps), mask))
-      l2_value_loss = jnp.mean((returns - values)**2) * self._value_loss_coeff
-      return awr_loss + l2_value_loss
+      return self._jit_joint_loss(preds, values, returns, actions, mask)
     return AWRJointLoss
@@ -16,12 +16,15 @@
 # Lint as: python3
 """Tests for RL training."""
 
+import collections
 import functools
 
 from absl.testing import absltest
+import numpy as np
 
 from trax import layers as tl
 from trax import lr_schedules
+from trax import math
 from trax import models
 from trax import optimizers as opt
 from trax.rl import actor_critic_joint
@@ -67,6 +70,49 @@ class ActorCriticJointTest(absltest.TestCase):
     trainer2.close()
 
 
+  def test_prefetch_to_device(self):
+    """Check look-ahead depth and dropping of queued batches."""
+    stream = iter(range(6))
+    queue = collections.deque()
+    with math.use_backend('numpy'):
+      prefetched = actor_critic_joint._prefetch_to_device(stream, queue,
+                                                          size=2)
+      self.assertEqual(next(prefetched), 0)
+      # The next two batches are already in flight.
+      self.assertEqual(list(queue), [1, 2])
+      # Dropped batches are never yielded; the stream is read anew instead.
+      queue.clear()
+      self.assertEqual(next(prefetched), 3)
+      self.assertEqual(list(queue), [4, 5])
+      self.assertEqual(list(prefetched), [4, 5])
+      self.assertEmpty(queue)
+
+  def test_jointppotrainer_drops_stale_batches(self):
+    """Check that only training is prefetched and each epoch starts afresh."""
+    task = rl_task.RLTask('CartPole-v0', initial_trajectories=10,
+                          max_steps=200)
+    joint_model = functools.partial(
+        models.PolicyAndValue,
+        body=lambda mode: tl.Serial(tl.Dense(64), tl.Relu()),
+    )
+    trainer = actor_critic_joint.PPOJointTrainer(
+        task,
+        joint_model=joint_model,
+        optimizer=opt.Adam,
+        batch_size=4,
+        train_steps_per_epoch=1,
+        collect_per_epoch=1)
+    trainer.run(1)
+    self.assertLen(trainer._prefetch_queues, 1)
+    queue = trainer._prefetch_queues[0]
+    self.assertLen(queue, 2)
+    # A batch queued before the next epoch must not be trained on.
+    stale = object()
+    queue.appendleft(stale)
+    trainer.run(1)
+    self.assertNotIn(stale, list(queue))
+    self.assertEqual(trainer._trainer.step, 2)
+
   def test_jointppotrainer_cartpole(self):
     """Test-runs joint PPO on CartPole."""
 
@@ -90,6 +136,51 @@ class ActorCriticJointTest(absltest.TestCase):
     trainer.run(2)
     self.assertEqual(2, trainer.current_epoch)
 
+  def test_jointppotrainer_use_real_example(self):
+    """Test initializing the eval model on a real batch and playing."""
+    task = rl_task.RLTask('CartPole-v0', initial_trajectories=2,
+                          max_steps=200)
+    joint_model = functools.partial(
+        models.PolicyAndValue,
+        body=lambda mode: tl.Serial(tl.Dense(64), tl.Relu()),
+    )
+    trainer = actor_critic_joint.PPOJointTrainer(
+        task,
+        joint_model=joint_model,
+        optimizer=opt.Adam,
+        batch_size=4,
+        train_steps_per_epoch=1,
+        collect_per_epoch=1,
+        use_real_example=True)
+    action, log_prob = trainer.policy(task.trajectories[0][0])
+    self.assertIn(int(action), [0, 1])
+    self.assertLessEqual(float(log_prob), 0.0)
+
+  def test_jointtrainers_low_precision_batches(self):
+    """Test that bfloat16 batches give finite float32 losses and metrics."""
+    joint_model = functools.partial(
+        models.PolicyAndValue,
+        body=lambda mode: tl.Serial(tl.Dense(64), tl.Relu()),
+    )
+    for trainer_class in (actor_critic_joint.PPOJointTrainer,
+                          actor_critic_joint.AWRJointTrainer):
+      task = rl_task.RLTask('CartPole-v0', initial_trajectories=10,
+                            max_steps=200)
+      trainer = trainer_class(
+          task,
+          joint_model=joint_model,
+          optimizer=opt.Adam,
+          batch_size=4,
+          train_steps_per_epoch=1,
+          collect_per_epoch=1,
+          low_precision_batches=True)
+      trainer.run(1)
+      history = trainer._trainer._history
+      for name in trainer._trainer._metrics:
+        value = history.get('train', 'metrics/' + name)[-1][1]
+        self.assertEqual(np.asarray(value).dtype, np.float32, name)
+        self.assertTrue(np.isfinite(value), name)
+
   def test_jointawrtrainer_cartpole(self):
     """Test-runs joint AWR on cartpole."""
     task = rl_task.RLTask('CartPole-v0', initial_trajectories=100,
@@ -22,16 +22,32 @@
 from trax.math import numpy as jnp
 
 
-def ValueLoss(values, returns, value_loss_coeff):
+def ValueLoss(advantages, value_loss_coeff):
   """Definition of the loss of the value function."""
-  advantages = returns - values
   l2_value_loss = jnp.mean(advantages**2) * value_loss_coeff
   return l2_value_loss
 
 
-def ExplainedVariance(values, returns):
+def Advantages(values, returns):
+  """Definition of advantages, shared by the metrics that use them."""
+  return returns - values
+
+
+def AdvantageMean(advantages):
+  """Definition of the mean of advantages."""
+  return jnp.mean(advantages)
+
+
+def AdvantageNorm(advantages):
+  """Definition of the norm of advantages."""
+  return jnp.linalg.norm(advantages)
+
+
+def ExplainedVariance(advantages, returns):
   """Definition of explained variance."""
-  return jnp.mean(1 - jnp.divide(returns - values, returns + 1e-8))
+  # Returns may arrive in low precision; the epsilon below needs float32.
+  returns = returns.astype(jnp.float32)
+  return jnp.mean(1 - jnp.divide(advantages, returns + 1e-8))
 
 
 def PreferredMove(dist_inputs, sample):
@@ -50,25 +66,46 @@ def NewLogProbs(dist_inputs, actions, log_prob_fun):
 
 # TODO(henrykm): Clarify how jnp.mean is applied.
 def EntropyLoss(dist_inputs, actions, log_prob_fun,
-                entropy_coeff, entropy_fun):
+                entropy_coeff, entropy_fun, new_log_probs=None):
   """Definition of the Entropy Layer."""
-  new_log_probs = NewLogProbs(dist_inputs, actions, log_prob_fun)
+  if new_log_probs is None:
+    new_log_probs = NewLogProbs(dist_inputs, actions, log_prob_fun)
   entropy_loss = entropy_fun(new_log_probs) * entropy_coeff
   return jnp.mean(entropy_loss)
 
 
-def ProbsRatio(dist_inputs, actions, old_log_probs, log_prob_fun):
+def ProbsRatio(dist_inputs, actions, old_log_probs, log_prob_fun,
+               new_log_probs=None):
   """Probability Ratio from the PPO algorithm."""
   # Old log probs have an undesirable extra dimension which we remove here
   old_log_probs = jnp.array(old_log_probs.squeeze(axis=-1),
                             dtype=jnp.float32)
-  new_log_probs = NewLogProbs(dist_inputs, actions, log_prob_fun)
+  if new_log_probs is None:
+    new_log_probs = NewLogProbs(dist_inputs, actions, log_prob_fun)
   # The ratio between new_probs and old_probs expressed
   # using log_probs and exponentaion
   probs_ratio = jnp.exp(new_log_probs - old_log_probs)
   return probs_ratio
 
 
+def ProbsRatioAndAdvantages(dist_inputs, values, returns, actions,
+                            old_log_probs, log_prob_fun):
+  """Probability ratio and advantages, the inputs of the PPO objectives."""
+  probs_ratio = ProbsRatio(dist_inputs, actions, old_log_probs, log_prob_fun)
+  advantages = Advantages(values, returns)
+  return probs_ratio, advantages
+
+
+def ProbsRatioMean(probs_ratio):
+  """Probability Ratio Mean from the PPO algorithm."""
+  return jnp.mean(probs_ratio)
+
+
+def ClipFraction(probs_ratio, epsilon):
+  """Fraction of probability ratios clipped in the PPO algorithm."""
+  return jnp.mean(jnp.abs(probs_ratio - 1) > epsilon)
+
+
 def ApproximateKLDivergence(dist_inputs, actions, old_log_probs, log_prob_fun):
   """Probability Ratio from the PPO algorithm."""
   # TODO(henrykm): Clarify the old_log_probs and squeezing
@@ -96,6 +133,36 @@ def ClippedObjective(probs_ratio, advantages, epsilon):
   return clipped_objective
 
 
+def UnclippedObjectiveMean(probs_ratio, advantages):
+  """Unclipped objective Mean from the PPO algorithm."""
+  unclipped_objective = UnclippedObjective(probs_ratio, advantages)
+  return jnp.mean(unclipped_objective)
+
+
+def ClippedObjectiveMean(probs_ratio, advantages, epsilon):
+  """Clipped objective Mean from the PPO algorithm."""
+  clipped_objective = ClippedObjective(probs_ratio, advantages, epsilon)
+  return jnp.mean(clipped_objective)
+
+
+def AWRLoss(log_probs, advantages, mask, beta, w_max):
+  """Definition of the Advantage Weighted Regression (AWR) loss."""
+  weights = jnp.minimum(jnp.exp(advantages / beta), w_max)
+  return -jnp.sum(log_probs * weights * mask) / jnp.sum(mask)
+
+
+def PPOObjectiveGivenRatio(probs_ratio, advantages, epsilon,
+                           normalize_advantages):
+  """PPO Objective given the probability ratio and advantages."""
+  if normalize_advantages:
+    advantages = advantages - jnp.mean(advantages)
+    advantages /= jnp.std(advantages) + 1e-8
+  unclipped_objective = UnclippedObjective(probs_ratio, advantages)
+  clipped_objective = ClippedObjective(probs_ratio, advantages, epsilon)
+  ppo_objective = jnp.minimum(unclipped_objective, clipped_objective)
+  return ppo_objective
+
+
 def PPOObjective(dist_inputs, values, returns, actions, old_log_probs,
                  log_prob_fun, epsilon, normalize_advantages):
   """PPO Objective."""
@@ -105,10 +172,13 @@ def PPOObjective(dist_inputs, values, returns, actions, old_log_probs,
   values = values.squeeze()
   probs_ratio = ProbsRatio(dist_inputs, actions, old_log_probs, log_prob_fun)
   advantages = returns - values
-  if normalize_advantages:
-    advantages = advantages - jnp.mean(advantages)
-    advantages /= jnp.std(advantages) + 1e-8
-  unclipped_objective = UnclippedObjective(probs_ratio, advantages)
-  clipped_objective = ClippedObjective(probs_ratio, advantages, epsilon)
-  ppo_objective = jnp.minimum(unclipped_objective, clipped_objective)
-  return ppo_objective
+  return PPOObjectiveGivenRatio(probs_ratio, advantages, epsilon,
+                                normalize_advantages)
+
+
+def PPOObjectiveMean(probs_ratio, advantages, epsilon, normalize_advantages):
+  """PPO Objective Mean given the probability ratio and advantages."""
+  # Returns and values are arriving with two extra dimensions
+  ppo_objective = PPOObjectiveGivenRatio(probs_ratio, advantages.squeeze(),
+                                         epsilon, normalize_advantages)
+  return jnp.mean(ppo_objective)
@@ -128,6 +128,25 @@ class Trajectory(object):
             np.array(ts.reward, dtype=np.float32),
             np.array(ts.discounted_return, dtype=np.float32))
 
+  def observations_np(self, timestep_to_np=None):
+    """Stack only the observations of this trajectory into a numpy array.
+
+    A cheaper alternative to `to_np` when only observations are needed, e.g.,
+    when choosing the next action: actions, log-probabilities, rewards and
+    returns are neither converted nor stacked.
+
+    Args:
+      timestep_to_np: the function used to convert timesteps, as in `to_np`.
+
+    Returns:
+      a numpy array of shape [L] + S where L is the length of the trajectory
+      and S is the shape of a single observation.
+    """
+    if timestep_to_np is None:
+      return np.stack([np.array(ts.observation) for ts in self._timesteps],
+                      axis=0)
+    return np.stack([timestep_to_np(ts)[0] for ts in self._timesteps], axis=0)
+
   def to_np(self, timestep_to_np=None):
     """Create a tuple of numpy arrays from a given trajectory."""
     observations, actions, logps, rewards, returns = [], [], [], [], []
@@ -197,14 +216,6 @@ def play(env, policy, dm_suite=False, max_steps=None):
   return cur_trajectory
 
 
-def _zero_pad(x, pad, axis):
-  """Helper for np.pad with 0s for single-axis case."""
-  pad_widths = [(0, 0)] * len(x.shape)
-  pad_widths[axis] = pad  # Padding on axis.
-  return np.pad(x, pad_widths, mode='constant',
-                constant_values=x.dtype.type(0))
-
-
 def _random_policy(action_space):
   # TODO(pkozakowski): Make returning the log probabilities optional.
   # Returning 1 as a log probability is a temporary hack.
@@ -486,8 +497,13 @@ class RLTask:
         return np.array(tensor_list)
 
       pad_len = 2**int(np.ceil(np.log2(max_len)))
-      return np.array([_zero_pad(t, (0, pad_len - t.shape[0]), axis=0)
-                       for t in tensor_list])
+      # Fill a single preallocated zero batch instead of padding every tensor
+      # into a temporary array and copying all of them once more.
+      batch = np.zeros((len(tensor_list), pad_len) + tensor_list[0].shape[1:],
+                       dtype=np.result_type(*tensor_list))
+      for i, t in enumerate(tensor_list):
+        batch[i, :t.shape[0]] = t
+      return batch
     cur_batch = []
     for t in self.trajectory_stream(
         epochs, max_slice_length,
@@ -109,6 +109,51 @@ class TaskTest(absltest.TestCase):
     self.assertLen(next_slice, 2)
     self.assertEqual(next_slice.last_observation.shape, (12, 13))
 
+  def test_trajectory_observations_np(self):
+    """Test stacking only the observations of a trajectory."""
+    tr1 = rl_task.Trajectory(np.zeros((2,)))
+    tr1.extend(0, 0, 0, np.ones((2,)))
+    tr1.extend(1, 0, 0, 2 * np.ones((2,)))
+    observations = tr1[-2:].observations_np()
+    self.assertEqual(observations.shape, (2, 2))
+    np.testing.assert_array_equal(observations,
+                                  tr1[-2:].to_np().observations)
+
+  def test_trajectory_batch_stream_padding(self):
+    """Test padding slices of different lengths in a batch."""
+    elem = np.ones((2,), dtype=np.float32)
+    tr1 = rl_task.Trajectory(elem)
+    for _ in range(3):
+      tr1.extend(1, 0.5, 1.0, elem)
+    tr2 = rl_task.Trajectory(elem)
+    for _ in range(2):
+      tr2.extend(1, 0.5, 1.0, elem)
+    tr1.calculate_returns(0.9)
+    tr2.calculate_returns(0.9)
+    task = rl_task.RLTask(DummyEnv(), initial_trajectories=[tr1, tr2],
+                          max_steps=9)
+    stream = task.trajectory_batch_stream(batch_size=2)
+    # Slices are sampled, so wait for a batch with both lengths (3 and 2).
+    for batch in stream:
+      if np.min(batch.mask) == 0:
+        break
+    # The longest slice has length 3, padded to the next power of two.
+    self.assertEqual(batch.observations.shape, (2, 4, 2))
+    self.assertEqual(batch.actions.shape, (2, 4))
+    lengths = np.sum(batch.mask, axis=1).astype(np.int32)
+    self.assertCountEqual(lengths, [2, 3])
+    for i, length in enumerate(lengths):
+      np.testing.assert_array_equal(batch.observations[i, length:], 0)
+      np.testing.assert_array_equal(batch.actions[i, length:], 0)
+      np.testing.assert_array_equal(batch.returns[i, length:], 0)
+      np.testing.assert_array_equal(batch.mask[i, :length], 1)
+    # Dtypes are the same as stacking the unpadded tensors.
+    self.assertEqual(batch.observations.dtype, np.float32)
+    self.assertEqual(batch.actions.dtype, np.array([1]).dtype)
+    self.assertEqual(batch.log_probs.dtype, np.float32)
+    self.assertEqual(batch.returns.dtype, np.float32)
+    self.assertEqual(batch.mask.dtype, np.ones(1).dtype)
+
   def test_trajectory_stream_final_state(self):
     """Test trajectory stream with and without the final state."""
     tr1 = rl_task.Trajectory(0)